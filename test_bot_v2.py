@@ -1,24 +1,49 @@
+import base64
+import io
 import os
+import asyncio
 import logging
-from typing import List
+import math
+import re
+import time
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+from collections import deque
+from typing import Iterable, List
 from datetime import datetime
 from zoneinfo import ZoneInfo
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.remote_connection import ChromeRemoteConnection
+from selenium.webdriver.chrome.service import Service
+from selenium.common.exceptions import JavascriptException
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from twocaptcha import TwoCaptcha
+import httpx
+from cachetools import TTLCache
+import requests
+from requests.adapters import HTTPAdapter
+from twocaptcha import ApiClient, ApiException, NetworkException, SolverExceptions, TwoCaptcha
 from dotenv import load_dotenv
-from telegram import Update
+from telegram import Bot, InputMediaPhoto, Update
 from telegram.ext import (
     Application,
     CommandHandler,
     ContextTypes,
 )
+from apscheduler.events import (
+    EVENT_JOB_MAX_INSTANCES,
+    EVENT_JOB_MISSED,
+    JobExecutionEvent,
+    JobSubmissionEvent,
+)
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 
+try:
+    from faster_whisper import WhisperModel
+except ImportError:  # İsteğe bağlı: yoksa captcha yalnızca 2Captcha ile çözülür
+    WhisperModel = None
+
 # Logging yapılandırması
 logging.basicConfig(
     filename="/app/bot.log",
@@ -35,36 +60,398 @@ BOT_TOKEN = os.getenv("TELEGRAM_TOKEN")
 GROUP_ID = os.getenv("GROUP_ID")
 TWOCAPTCHA_API_KEY = os.getenv("TWOCAPTCHA_API_KEY")
 SITES_FILE_PATH = os.getenv("SITES_FILE_PATH", "/app/sites_v2.txt")
+# Ekleme/çıkarma günlüğü (+site / -site); sıkıştırılınca siteler dosyasına yazılır
+SITES_JOURNAL_PATH = SITES_FILE_PATH + ".journal"
 ISTANBUL_TZ = ZoneInfo("Europe/Istanbul")
+BTK_QUERY_URL = "https://internet.btk.gov.tr/tr/sorgu/sorgula"
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36"
 
 class BotConfig:
     QUERY_INTERVAL = 2 * 60  # 2 dakika
     MAX_RETRIES = 3
     WORKING_HOURS = {"start": 8, "end": 21}  # 08:00-21:00
     WORKING_DAYS = ["mon", "tue", "wed", "thu", "fri"]
+    CAPTCHA_POLL_INTERVAL = 5  # saniye
+    CAPTCHA_TIMEOUT = 180  # saniye
+    CAPTCHA_BACKOFF_BASE = 1.0  # saniye; 2Captcha hız sınırında her denemede ikiye katlanır
+    CAPTCHA_BACKOFF_MAX = 47.0  # saniye
+    MAX_PARALLEL_QUERIES = 3  # aynı anda süren BTK sorgusu (2Captcha ve BTK kota sınırlı)
+    ELEMENT_TIMEOUT = 10  # saniye
+    MAX_STATUS_LENGTH = 200  # Telegram açıklaması en fazla 1024 karakter; hata metni kısaltılır
+    DOM_POLL_INTERVAL = 0.2  # saniye; ses sorusu adımları arasında sürücü kilidi bırakılır
+    DRIVER_MAX_USES = 50  # bu kadar sorgudan sonra Chrome oturumu yenilenir
+    # Varsayılan olarak BTK formu doğrudan HTTP ile gönderilir; sayfa çözümlenemezse
+    # süreç boyunca tarayıcıya (Selenium) geçilir (bot_data["use_browser"])
+    USE_BROWSER = os.getenv("USE_BROWSER", "false").lower() == "true"
+    HTTP_TIMEOUT = 30  # saniye
+    BTK_RATE = 1 / 60  # saniyede sorgu; dakikada bir
+    BTK_BURST = 2  # art arda izin verilen sorgu
+    STATUS_CACHE_TTL = 30 * 60  # "Erişim serbest" sonucu bu süre yeniden sorgulanmaz
+    SITES_COMPACT_EVERY = 50  # günlükte bu kadar kayıt birikince siteler dosyası yeniden yazılır
+    # BTK sayfasının reCAPTCHA anahtarı sabittir; verilmezse ilk sorguda sayfadan öğrenilir
+    # (bot_data["recaptcha_site_key"])
+    RECAPTCHA_SITE_KEY = os.getenv("RECAPTCHA_SITE_KEY")
+    # reCAPTCHA ses sorusunu yerel Whisper modeliyle çöz; başarısızsa 2Captcha'ya düş
+    AUDIO_CAPTCHA = os.getenv("AUDIO_CAPTCHA", "true").lower() == "true"
+    WHISPER_MODEL = os.getenv("WHISPER_MODEL", "tiny")
+    AUDIO_MIN_CONFIDENCE = 0.5  # ortalama token olasılığı
+    AUDIO_TOKEN_TIMEOUT = 5  # saniye
+
+# BTK sonuç metnindeki engel ifadeleri; Türkçe harf ve büyük/küçük harf varyantlarıyla
+_BLOCKED_RE = re.compile(
+    r"eri[şs]imi\s+engellenmi[şs]tir|engellendi|yasakl[ıi]",
+    re.IGNORECASE,
+)
+# Site hakkında karar olmadığını bildiren ifade; yalnızca bu eşleşirse site serbest sayılır
+_FREE_RE = re.compile(r"uygulanan\s+bir\s+karar\s+bulunamad[ıi]", re.IGNORECASE)
+
+# Alan adı: nokta ile ayrılmış 1-63 karakterlik etiketler ve harflerden oluşan uzantı
+_DOMAIN_RE = re.compile(r"(?:[a-zA-Z0-9](?:[a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?\.)+[a-zA-Z]{2,}")
+
+# Seçiciyle eşleşen öğe belirene kadar tarayıcı içinde bekleyen yardımcı (MutationObserver).
+# WebDriverWait'in 500 ms'lik yoklamalarını tek chromedriver çağrısına indirir.
+_WAIT_FOR_JS = """
+const waitFor = (selector, callback) => {
+    const el = document.querySelector(selector);
+    if (el) return callback(el);
+    new MutationObserver((_, observer) => {
+        const el = document.querySelector(selector);
+        if (el) {
+            observer.disconnect();
+            callback(el);
+        }
+    }).observe(document, {childList: true, subtree: true});
+};
+"""
+
+# Öğe belirene kadar bekler ve metnini döndürür (arguments: seçici, geri çağırma)
+_AWAIT_ELEMENT_JS = _WAIT_FOR_JS + """
+const [selector, done] = arguments;
+waitFor(selector, (el) => done(el.innerText));
+"""
+
+# Sorgu alanını bekler, siteyi yazar (input/change olaylarıyla) ve reCAPTCHA site
+# anahtarını aynı çağrıda döndürür (arguments: site, geri çağırma)
+_FILL_QUERY_JS = _WAIT_FOR_JS + """
+const [site, done] = arguments;
+waitFor("#domainInput", (el) => {
+    el.value = site;
+    el.dispatchEvent(new Event("input", {bubbles: true}));
+    el.dispatchEvent(new Event("change", {bubbles: true}));
+    const recaptcha = document.querySelector(".g-recaptcha");
+    done(recaptcha ? recaptcha.getAttribute("data-sitekey") : null);
+});
+"""
+
+# reCAPTCHA jetonunu yazar ve sorguyu gönderir (arguments: jeton)
+_SUBMIT_QUERY_JS = """
+document.getElementById("g-recaptcha-response").innerHTML = arguments[0];
+document.getElementById("sorgulaButton").click();
+"""
+
+# reCAPTCHA çerçeveleri adresleriyle seçilir; başlıkları sayfa diliyle çevrilir
+_ANCHOR_FRAME = "iframe[src*='/recaptcha/api2/anchor']"
+_CHALLENGE_FRAME = "iframe[src*='/recaptcha/api2/bframe']"
+
+# Ses sorusu adımlarının durum okumaları: beklemez, anlık durumu döndürür. Bekleme
+# Python tarafında kilit bırakılarak yapılır; chromedriver oturum başına tek komut
+# işlediğinden tarayıcı içinde beklemek diğer sekmeleri de durdururdu.
+
+# Kutucuk soru sorulmadan geçildiyse jeton, soru penceresi göründüyse boş metin
+_ANCHOR_STATE_JS = """
+const token = document.getElementById("g-recaptcha-response").value;
+if (token) return token;
+const challenge = document.querySelector("iframe[src*='/recaptcha/api2/bframe']");
+if (challenge && getComputedStyle(challenge).visibility === "visible") return "";
+return null;
+"""
+
+# Soru penceresinde ses sorusu düğmesi belirdiyse true, henüz yoksa null
+_AUDIO_BUTTON_JS = 'return document.getElementById("recaptcha-audio-button") ? true : null;'
+
+# Ses dosyasının adresi; Google otomasyondan şüphelenip "daha sonra tekrar deneyin"
+# gösterirse boş metin
+_AUDIO_SOURCE_JS = """
+const source = document.getElementById("audio-source");
+if (source && source.src) return source.src;
+if (document.querySelector(".rc-doscaptcha-header")) return "";
+return null;
+"""
+
+# Ses dosyasını tarayıcı oturumu içinde indirmeye başlar; sonuç (base64, hata olursa
+# boş metin) window.__btkAudio'ya yazılır (arguments: adres)
+_START_AUDIO_FETCH_JS = """
+window.__btkAudio = null;
+fetch(arguments[0])
+    .then((response) => response.blob())
+    .then((blob) => {
+        const reader = new FileReader();
+        reader.onload = () => { window.__btkAudio = reader.result.split(",")[1]; };
+        reader.readAsDataURL(blob);
+    })
+    .catch(() => { window.__btkAudio = ""; });
+"""
+_AUDIO_RESULT_JS = "return window.__btkAudio;"
+
+# Yazılan reCAPTCHA jetonu
+_TOKEN_JS = 'return document.getElementById("g-recaptcha-response").value || null;'
+
+class SiteStore:
+    """Sorgulanacak siteler: sıra için deque, üyelik kontrolü için set."""
+
+    def __init__(self, sites: Iterable[str] = ()) -> None:
+        self._order: deque[str] = deque()
+        self._set: set[str] = set()
+        # Değiştirip dosyaya yazan herkes bu kilidi tutar; yazımlar sırayla olur
+        self.lock = asyncio.Lock()
+        for site in sites:
+            self.add(site)
+
+    def __contains__(self, site: object) -> bool:
+        return site in self._set
+
+    def __iter__(self):
+        return iter(self._order)
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def add(self, site: str) -> bool:
+        """Siteyi sona ekle; zaten varsa False döndür."""
+        if site in self._set:
+            return False
+        self._order.append(site)
+        self._set.add(site)
+        return True
+
+    def remove(self, site: str) -> bool:
+        """Siteyi çıkar; listede yoksa False döndür."""
+        if site not in self._set:
+            return False
+        self._set.remove(site)
+        self._order.remove(site)
+        return True
+
+def is_valid_domain(domain: str) -> bool:
+    """Girdinin geçerli bir alan adı olup olmadığını kontrol et."""
+    return _DOMAIN_RE.fullmatch(domain) is not None
+
+def classify_result(text: str) -> str:
+    """BTK sonuç metnini durum metnine çevir; tanınmayan metin (captcha/hata) serbest sayılmaz."""
+    if _BLOCKED_RE.search(text):
+        return "Erişim engelli"
+    if _FREE_RE.search(text):
+        return "Erişim serbest"
+    logger.warning("Tanınmayan BTK sonucu: %s", text)
+    return "Sonuç alınamadı"
+
+class TokenBucket:
+    """Asenkron token bucket: saniyede `rate` jeton dolar, en fazla `burst` birikir."""
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Bir jeton al; yoksa bir sonraki jeton dolana kadar bekle."""
+        # Kilit bekleme boyunca tutulur; bekleyenler geliş sırasıyla geçer
+        async with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._tokens = 1.0
+                self._updated = time.monotonic()
+            self._tokens -= 1
+
+class _BtkPageParser(HTMLParser):
+    """BTK sayfasından sorgu formunu, reCAPTCHA anahtarını ve sonuç metnini çıkarır."""
+
+    _VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "wbr"}
+
+    def __init__(self, html: str) -> None:
+        super().__init__()
+        self.query_form: dict | None = None
+        self.site_key: str | None = None
+        self.result_text: str | None = None
+        self._form: dict | None = None
+        self._result_parts: list[str] = []
+        self._result_depth = 0
+        self.feed(html)
+        self.close()
+        if self._result_parts:
+            self.result_text = " ".join("".join(self._result_parts).split())
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        attrs = dict(attrs)
+        classes = (attrs.get("class") or "").split()
+        if tag == "form":
+            self._form = {
+                "action": attrs.get("action") or "",
+                "method": (attrs.get("method") or "post").lower(),
+                "fields": {},
+                "domain_field": None,
+            }
+        elif tag in ("input", "textarea") and self._form is not None and attrs.get("name"):
+            checkable = (attrs.get("type") or "").lower() in ("checkbox", "radio")
+            if not checkable or "checked" in attrs:
+                self._form["fields"][attrs["name"]] = attrs.get("value") or ""
+            if attrs.get("id") == "domainInput":
+                self._form["domain_field"] = attrs["name"]
+        if "g-recaptcha" in classes:
+            self.site_key = attrs.get("data-sitekey")
+
+        if tag in self._VOID_TAGS:
+            return
+        if self._result_depth:
+            self._result_depth += 1
+        elif "sonucMesaji" in classes:
+            self._result_depth = 1
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "form" and self._form is not None:
+            if self._form["domain_field"]:
+                self.query_form = self._form
+            self._form = None
+        if self._result_depth and tag not in self._VOID_TAGS:
+            self._result_depth -= 1
+
+    def handle_data(self, data: str) -> None:
+        if self._result_depth:
+            self._result_parts.append(data)
+
+class SessionApiClient(ApiClient):
+    """2Captcha API istemcisi; tüm istekler tek bir keep-alive oturumundan geçer.
+
+    Kütüphanenin istemcisi her istekte requests.post/get çağırıp yeni TLS
+    bağlantısı açar; yoklama döngüsünde bu her 5 saniyede bir el sıkışma demek.
+    """
+
+    def __init__(self, post_url: str = "2captcha.com") -> None:
+        super().__init__(post_url=post_url)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=BotConfig.MAX_PARALLEL_QUERIES
+        )
+        self.session.mount("https://", adapter)
+
+    def _request(self, method: str, path: str, **kwargs) -> str:
+        try:
+            resp = self.session.request(
+                method, f"https://{self.post_url}/{path}", timeout=30, **kwargs
+            )
+        except requests.RequestException as e:
+            raise NetworkException(e)
+        if resp.status_code != 200:
+            raise NetworkException(f"bad response: {resp.status_code}")
+        text = resp.content.decode("utf-8")
+        if "ERROR" in text:
+            raise ApiException(text)
+        return text
+
+    def in_(self, files=None, **kwargs) -> str:
+        if files or "file" in kwargs:
+            # Dosya yüklemeleri kullanılmıyor; kütüphanenin kendi yoluna bırak
+            return super().in_(files=files, **kwargs)
+        return self._request("POST", "in.php", data=kwargs)
+
+    def res(self, **kwargs) -> str:
+        return self._request("GET", "res.php", params=kwargs)
+
+captcha_solver = TwoCaptcha(TWOCAPTCHA_API_KEY)
+captcha_solver.api_client = SessionApiClient()
+# Yalnızca "Erişim serbest" sonuçları tutulur; engel/hata her seferinde yeniden sorgulanır
+_status_cache: TTLCache = TTLCache(maxsize=1024, ttl=BotConfig.STATUS_CACHE_TTL)
+# 2Captcha hız sınırı bildirdiğinde eşzamanlı tüm sorguların bekleyeceği an (monotonic)
+_captcha_cooldown_until = 0.0
+
+# SITES_LIST süreç boyunca değişmez; bir kez ayrıştır
+_ENV_SITES = [site.strip() for site in os.getenv("SITES_LIST", "").split(",") if site.strip()]
+# Son sıkıştırmadan beri günlüğe yazılan kayıt sayısı
+_journal_entries = 0
+
+def _replay_sites_journal(sites: List[str]) -> tuple[List[str], int]:
+    """Günlükteki ekleme/çıkarma kayıtlarını site listesine uygula; (siteler, kayıt sayısı) döndür."""
+    try:
+        with open(SITES_JOURNAL_PATH, "r", encoding="utf-8") as file:
+            entries = [line.strip() for line in file if line.strip()]
+    except FileNotFoundError:
+        return sites, 0
+    ordered = dict.fromkeys(sites)
+    for entry in entries:
+        if entry[0] == "+":
+            ordered.setdefault(entry[1:])
+        elif entry[0] == "-":
+            ordered.pop(entry[1:], None)
+    return list(ordered), len(entries)
 
 def load_sites() -> List[str]:
-    """Siteleri dosyadan veya ortam değişkeninden yükle."""
-    logger.info("Siteler yükleniyor...")
-    sites_str = os.getenv("SITES_LIST")
-    if sites_str:
-        sites = [site.strip() for site in sites_str.split(",") if site.strip()]
-        logger.info(f"Ortam değişkeninden yüklenen siteler: {sites}")
-        return sites
+    """Siteleri dosyadan veya ortam değişkeninden yükle; açılışta bir kez çağrılır."""
+    global _journal_entries
+    if _ENV_SITES:
+        return list(_ENV_SITES)
     if not os.path.exists(SITES_FILE_PATH):
         raise FileNotFoundError(f"Siteler dosyası bulunamadı: {SITES_FILE_PATH}")
+
+    logger.info("Siteler yükleniyor...")
     with open(SITES_FILE_PATH, "r", encoding="utf-8") as file:
         sites = [line.strip() for line in file if line.strip()]
+    # Sıkıştırma sayacı, yeniden başlatmadan önce biriken kayıtlardan devam etsin
+    sites, _journal_entries = _replay_sites_journal(sites)
     logger.info(f"Dosyadan yüklenen siteler: {sites}")
     return sites
 
-def update_sites_file(sites: List[str]) -> None:
-    """Siteleri dosyaya yaz."""
+def update_sites_file(sites: Iterable[str]) -> None:
+    """Siteleri dosyaya yaz ve değişiklik günlüğünü sıfırla."""
+    global _journal_entries
+    sites = list(sites)
     logger.info("Siteler dosyaya yazılıyor: %s", sites)
-    with open(SITES_FILE_PATH, "w", encoding="utf-8") as file:
-        file.write("\n".join(sites) + "\n")
+    # Geçici dosyaya yazıp yerine taşı; yarıda kalan yazım listeyi bozmasın
+    tmp_path = SITES_FILE_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        file.write("\n".join(sites))
+        file.write("\n")
+    os.replace(tmp_path, SITES_FILE_PATH)
+    # Silinmeden önce çökülürse günlük yeni dosyaya yeniden uygulanır; kayıtlar idempotenttir
+    try:
+        os.remove(SITES_JOURNAL_PATH)
+    except FileNotFoundError:
+        pass
+    _journal_entries = 0
+
+def append_sites_journal(entries: Iterable[str], sites: Iterable[str]) -> None:
+    """Değişiklikleri günlüğe ekle; günlük uzadığında siteleri dosyaya sıkıştır."""
+    global _journal_entries
+    entries = list(entries)
+    logger.info("Site günlüğüne yazılıyor: %s", entries)
+    with open(SITES_JOURNAL_PATH, "a", encoding="utf-8") as file:
+        file.write("".join(f"{entry}\n" for entry in entries))
+    _journal_entries += len(entries)
+    if _journal_entries >= BotConfig.SITES_COMPACT_EVERY:
+        update_sites_file(sites)
 
-def setup_driver(headless: bool = True) -> webdriver.Chrome:
+def start_chrome_service() -> Service:
+    """Chromedriver sürecini bir kez başlat; oturumlar bu sürece bağlanır."""
+    chromedriver_path = "/usr/lib/chromium/chromedriver"
+    if not os.path.exists(chromedriver_path):
+        logger.error("Chromedriver bulunamadı: %s", chromedriver_path)
+        raise RuntimeError("Chromedriver yüklü değil.")
+
+    service = Service(executable_path=chromedriver_path)
+    service.start()
+    logger.info("Chromedriver servisi başlatıldı: %s", service.service_url)
+    return service
+
+def execute_cdp(driver: webdriver.Remote, cmd: str, params: dict) -> dict:
+    """Uzak Chrome oturumunda bir DevTools Protocol komutu çalıştır."""
+    return driver.execute("executeCdpCommand", {"cmd": cmd, "params": params})["value"]
+
+def setup_driver(service: Service, headless: bool = True) -> webdriver.Remote:
     """Selenium WebDriver'ı anti-detection seçenekleriyle kur."""
     logger.info("Chromedriver başlatılıyor...")
     chrome_options = Options()
@@ -73,9 +460,34 @@ def setup_driver(headless: bool = True) -> webdriver.Chrome:
     chrome_options.add_argument("--disable-gpu")
     chrome_options.add_argument("--no-sandbox")
     chrome_options.add_argument("--disable-dev-shm-usage")
+    # Kullanılmayan arka plan servislerini kapat; bellek ve boşta CPU kullanımını düşürür
+    chrome_options.add_argument("--disable-extensions")
+    chrome_options.add_argument("--disable-background-networking")
+    chrome_options.add_argument("--disable-sync")
+    chrome_options.add_argument("--disable-translate")
+    chrome_options.add_argument("--disable-default-apps")
     chrome_options.add_argument(
-        "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36"
+        "--disable-features=TranslateUI,BlinkGenPropertyTrees,IsolateOrigins,site-per-process"
     )
+    chrome_options.add_argument("--metrics-recording-only")
+    chrome_options.add_argument("--no-first-run")
+    chrome_options.add_argument("--no-default-browser-check")
+    chrome_options.add_argument("--mute-audio")
+    chrome_options.add_argument("--hide-scrollbars")
+    # BTK sonucu metin; görseller gerekmiyor. Stil dosyaları ekran görüntüsü için açık kalır,
+    # ses sorusu görsel kullanmadığından reCAPTCHA bundan etkilenmez
+    chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+    chrome_options.add_experimental_option("prefs", {
+        "profile.managed_default_content_settings.images": 2,
+        "profile.default_content_setting_values.notifications": 2,
+        "profile.default_content_setting_values.geolocation": 2,
+        "profile.default_content_setting_values.plugins": 2,
+        "credentials_enable_service": False,
+        "profile.password_manager_enabled": False,
+    })
+    chrome_options.add_argument("--disk-cache-size=0")
+    chrome_options.add_argument("--window-size=1280,720")
+    chrome_options.add_argument(f"user-agent={USER_AGENT}")
     chrome_options.add_argument("--disable-blink-features=AutomationControlled")
     chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
     chrome_options.add_experimental_option("useAutomationExtension", False)
@@ -89,128 +501,580 @@ def setup_driver(headless: bool = True) -> webdriver.Chrome:
     chrome_options.binary_location = chrome_path
     logger.debug("Chrome yolu: %s", chrome_path)
 
-    # ChromeDriver yolu
-    chromedriver_path = "/usr/lib/chromium/chromedriver"
-    if not os.path.exists(chromedriver_path):
-        logger.error("Chromedriver bulunamadı: %s", chromedriver_path)
-        raise RuntimeError("Chromedriver yüklü değil.")
-
     try:
-        driver = webdriver.Chrome(executable_path=chromedriver_path, options=chrome_options)
+        # Çalışan chromedriver servisine bağlan; her oturumda yeni süreç başlatma
+        driver = webdriver.Remote(
+            command_executor=ChromeRemoteConnection(service.service_url),
+            options=chrome_options,
+        )
         logger.info("Chromedriver başarıyla başlatıldı.")
     except Exception as e:
         logger.error("Chromedriver başlatma hatası: %s", e, exc_info=True)
         raise
 
-    driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+    # Her yeni belgede (sekme, navigasyon) otomatik çalışsın diye CDP ile bir kez kaydet
+    execute_cdp(
+        driver,
+        "Page.addScriptToEvaluateOnNewDocument",
+        {"source": "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"},
+    )
+    driver.set_script_timeout(BotConfig.ELEMENT_TIMEOUT)
     return driver
 
-async def check_site_status(context: ContextTypes.DEFAULT_TYPE, site: str) -> tuple[str, str]:
-    """Siteyi BTK'da sorgula."""
-    logger.info("Site sorgulanıyor: %s", site)
-    driver = None
-    status = "Erişim serbest"
-    screenshot_path = f"/app/{site}_screenshot.png"
+def get_or_create_driver(app: Application) -> webdriver.Remote:
+    """Kalıcı WebDriver oturumunu döndür, yoksa oluştur.
+
+    Chromedriver servisi ilk tarayıcı sorgusunda başlatılır; HTTP kipinde hiç başlamaz.
+    """
+    driver = app.bot_data.get("driver")
+    if driver is None:
+        service = app.bot_data.get("chrome_service")
+        if service is None:
+            service = app.bot_data["chrome_service"] = start_chrome_service()
+        driver = setup_driver(service)
+        app.bot_data["driver"] = driver
+        app.bot_data["driver_uses"] = 0
+    return driver
 
+def discard_driver(app: Application) -> None:
+    """Kalıcı WebDriver oturumunu kapat ve yuvayı boşalt."""
+    driver = app.bot_data.pop("driver", None)
+    if driver is None:
+        return
     try:
-        driver = setup_driver()
-        driver.get("https://internet.btk.gov.tr/tr/sorgu/sorgula")
-
-        # Sorgu alanına siteyi gir
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.ID, "domainInput"))
-        ).send_keys(site)
-
-        # reCAPTCHA'yı çöz
-        solver = TwoCaptcha(TWOCAPTCHA_API_KEY)
-        recaptcha = driver.find_element(By.CLASS_NAME, "g-recaptcha")
-        site_key = recaptcha.get_attribute("data-sitekey")
-        captcha_result = solver.recaptcha(
-            sitekey=site_key,
-            url=driver.current_url
+        driver.quit()
+        logger.info("Chromedriver kapatıldı.")
+    except Exception as e:
+        logger.warning("Chromedriver kapatma hatası: %s", e)
+
+async def recycle_driver(app: Application) -> None:
+    """Bellek büyümesini sınırlamak için WebDriver oturumunu kapat; sonraki sorgu yenisini açar."""
+    async with app.bot_data["driver_lock"]:
+        logger.info("Chromedriver yenileniyor...")
+        await asyncio.to_thread(discard_driver, app)
+
+async def release_resources(app: Application) -> None:
+    """Kapanışta site günlüğünü sıkıştır, WebDriver oturumunu, servisi ve HTTP havuzunu kapat."""
+    store = app.bot_data.get("sites")
+    if store is not None and _journal_entries:
+        async with store.lock:
+            await asyncio.to_thread(update_sites_file, list(store))
+    await asyncio.to_thread(discard_driver, app)
+    service = app.bot_data.pop("chrome_service", None)
+    if service:
+        await asyncio.to_thread(service.stop)
+        logger.info("Chromedriver servisi durduruldu.")
+    transport = app.bot_data.pop("http_transport", None)
+    if transport:
+        await transport.aclose()
+
+def _open_tab(driver: webdriver.Remote) -> str:
+    """Sorgu için yeni bir sekme aç ve tanıtıcısını döndür."""
+    if len(driver.window_handles) == 1:
+        # Başka sorgu sürmüyorsa oturumu temiz başlat; çerezler sekmeler arasında ortaktır
+        driver.delete_all_cookies()
+    driver.switch_to.new_window("tab")
+    return driver.current_window_handle
+
+def _close_tab(driver: webdriver.Remote, handle: str, capture: bool = True) -> bytes | None:
+    """Sekmeyi kapat ve ana pencereye dön; istenirse önce tam sayfa PNG ekran görüntüsü al."""
+    driver.switch_to.window(handle)
+    png = None
+    if capture:
+        # Pencereyi büyütmeden görünür alanın dışını da yakala; yeniden yerleşim olmaz
+        shot = execute_cdp(driver, "Page.captureScreenshot", {
+            "format": "png",
+            "captureBeyondViewport": True,
+            "fromSurface": True,
+        })
+        png = base64.b64decode(shot["data"])
+    driver.close()
+    driver.switch_to.window(driver.window_handles[0])
+    return png
+
+def _execute_async(driver: webdriver.Remote, script: str, *args):
+    """Asenkron betiği çalıştır; beklerken sayfa yenilendiyse (form gönderimi) bir kez daha dene."""
+    try:
+        return driver.execute_async_script(script, *args)
+    except JavascriptException:
+        return driver.execute_async_script(script, *args)
+
+def _await_element(driver: webdriver.Remote, selector: str) -> str:
+    """Öğeyi tarayıcı içinde bekle ve metnini döndür."""
+    return _execute_async(driver, _AWAIT_ELEMENT_JS, selector)
+
+def _open_query_page(driver: webdriver.Remote, site: str) -> str:
+    """Sorgu sayfasını aç, siteyi gir ve reCAPTCHA site anahtarını döndür."""
+    driver.get(BTK_QUERY_URL)
+
+    # Sorgu alanına siteyi gir; site anahtarı aynı çağrıda gelir
+    site_key = _execute_async(driver, _FILL_QUERY_JS, site)
+    if not site_key:
+        raise RuntimeError("Sorgu sayfasında reCAPTCHA bulunamadı.")
+    return site_key
+
+def _submit_query(driver: webdriver.Remote, handle: str, token: str) -> str:
+    """reCAPTCHA jetonunu gir, sorguyu gönder ve sonucu döndür."""
+    driver.switch_to.window(handle)
+
+    # Jetonu gir ve Sorgula butonuna tıkla; tek WebDriver çağrısı
+    driver.execute_script(_SUBMIT_QUERY_JS, token)
+
+    # Sonucu kontrol et
+    return classify_result(_await_element(driver, ".sonucMesaji"))
+
+def load_whisper_model():
+    """Ses sorusu için yerel Whisper modelini yükle; kapalı ya da kurulu değilse None döndür."""
+    if not BotConfig.AUDIO_CAPTCHA:
+        return None
+    if WhisperModel is None:
+        logger.warning("faster-whisper kurulu değil; captcha yalnızca 2Captcha ile çözülecek.")
+        return None
+    model = WhisperModel(BotConfig.WHISPER_MODEL, device="cpu", compute_type="int8")
+    logger.info("Whisper modeli yüklendi: %s", BotConfig.WHISPER_MODEL)
+    return model
+
+async def get_whisper_model(context: ContextTypes.DEFAULT_TYPE):
+    """Whisper modelini ilk tarayıcı sorgusunda iş parçacığında yükle (ilk açılışta indirir)."""
+    async with context.bot_data["whisper_lock"]:
+        if "whisper_model" not in context.bot_data:
+            try:
+                context.bot_data["whisper_model"] = await asyncio.to_thread(load_whisper_model)
+            except Exception as e:
+                logger.warning("Whisper modeli yüklenemedi; captcha 2Captcha ile çözülecek: %s", e)
+                context.bot_data["whisper_model"] = None
+    return context.bot_data["whisper_model"]
+
+def _run_in_frame(driver: webdriver.Remote, handle: str, frame: str | None, script: str, *args):
+    """Sekmeye (verilirse iç çerçeveye) geçip kısa bir betik çalıştır ve ana belgeye dön."""
+    driver.switch_to.window(handle)
+    try:
+        if frame:
+            driver.switch_to.frame(driver.find_element(By.CSS_SELECTOR, frame))
+        return driver.execute_script(script, *args)
+    finally:
+        driver.switch_to.default_content()
+
+def _click_in_frame(driver: webdriver.Remote, handle: str, frame: str, element_id: str) -> None:
+    """Çerçevedeki öğeye gerçek tıklama gönder; reCAPTCHA betikle tıklamayı kabul etmez."""
+    driver.switch_to.window(handle)
+    try:
+        driver.switch_to.frame(driver.find_element(By.CSS_SELECTOR, frame))
+        driver.find_element(By.ID, element_id).click()
+    finally:
+        driver.switch_to.default_content()
+
+async def _poll_in_frame(
+    context: ContextTypes.DEFAULT_TYPE,
+    driver: webdriver.Remote,
+    handle: str,
+    frame: str | None,
+    script: str,
+    timeout: float,
+):
+    """Durum betiğini sonuç dönene kadar yokla; her okuma arasında sürücü kilidini bırak."""
+    deadline = time.monotonic() + timeout
+    while True:
+        async with context.bot_data["driver_lock"]:
+            result = await asyncio.to_thread(_run_in_frame, driver, handle, frame, script)
+        if result is not None or time.monotonic() >= deadline:
+            return result
+        await asyncio.sleep(BotConfig.DOM_POLL_INTERVAL)
+
+def _transcribe_audio(model, audio: bytes) -> tuple[str, float]:
+    """Ses sorusunu yazıya dök; cevabı ve güven değerini döndür."""
+    segments = list(model.transcribe(io.BytesIO(audio), beam_size=1)[0])
+    if not segments:
+        return "", 0.0
+    answer = re.sub(r"[^\w\s]", "", " ".join(segment.text for segment in segments)).strip().lower()
+    confidence = math.exp(sum(segment.avg_logprob for segment in segments) / len(segments))
+    return answer, confidence
+
+def _answer_audio_challenge(driver: webdriver.Remote, handle: str, answer: str) -> None:
+    """Ses sorusunun cevabını yaz ve doğrula düğmesine bas."""
+    driver.switch_to.window(handle)
+    try:
+        driver.switch_to.frame(driver.find_element(By.CSS_SELECTOR, _CHALLENGE_FRAME))
+        driver.find_element(By.ID, "audio-response").send_keys(answer)
+        driver.find_element(By.ID, "recaptcha-verify-button").click()
+    finally:
+        driver.switch_to.default_content()
+
+async def solve_recaptcha_audio(
+    context: ContextTypes.DEFAULT_TYPE, driver: webdriver.Remote, handle: str
+) -> str | None:
+    """reCAPTCHA'yı ses sorusu üzerinden yerel olarak çözmeyi dene; olmazsa None döndür.
+
+    Sürücü kilidi yalnızca tıklama ve anlık DOM okumaları sırasında tutulur;
+    bekleme ve ses indirme sürerken diğer sekmeler ilerleyebilir.
+    """
+    model = await get_whisper_model(context)
+    if model is None:
+        return None
+    driver_lock = context.bot_data["driver_lock"]
+    try:
+        async with driver_lock:
+            await asyncio.to_thread(_click_in_frame, driver, handle, _ANCHOR_FRAME, "recaptcha-anchor")
+        token = await _poll_in_frame(
+            context, driver, handle, None, _ANCHOR_STATE_JS, BotConfig.AUDIO_TOKEN_TIMEOUT
+        )
+        if token:
+            logger.info("reCAPTCHA soru sorulmadan geçildi.")
+            return token
+
+        if not await _poll_in_frame(
+            context, driver, handle, _CHALLENGE_FRAME, _AUDIO_BUTTON_JS, BotConfig.ELEMENT_TIMEOUT
+        ):
+            logger.info("Ses sorusu düğmesi bulunamadı, 2Captcha kullanılacak.")
+            return None
+        async with driver_lock:
+            await asyncio.to_thread(
+                _click_in_frame, driver, handle, _CHALLENGE_FRAME, "recaptcha-audio-button"
+            )
+        src = await _poll_in_frame(
+            context, driver, handle, _CHALLENGE_FRAME, _AUDIO_SOURCE_JS, BotConfig.ELEMENT_TIMEOUT
         )
-        driver.execute_script(
-            f'document.getElementById("g-recaptcha-response").innerHTML="{captcha_result["code"]}";'
+        if not src:
+            logger.info("Ses sorusu verilmedi, 2Captcha kullanılacak.")
+            return None
+
+        # Aynı oturumla indir; Python'dan ayrı bağlantı ve disk yazımı gerekmez
+        async with driver_lock:
+            await asyncio.to_thread(
+                _run_in_frame, driver, handle, _CHALLENGE_FRAME, _START_AUDIO_FETCH_JS, src
+            )
+        audio_b64 = await _poll_in_frame(
+            context, driver, handle, _CHALLENGE_FRAME, _AUDIO_RESULT_JS, BotConfig.ELEMENT_TIMEOUT
         )
+        if not audio_b64:
+            logger.info("Ses dosyası indirilemedi, 2Captcha kullanılacak.")
+            return None
 
-        # Sorgula butonuna tıkla
-        driver.find_element(By.ID, "sorgulaButton").click()
+        # Çıkarım kilidin dışında; diğer sekmeler bu sırada ilerleyebilir
+        audio = base64.b64decode(audio_b64)
+        answer, confidence = await asyncio.to_thread(_transcribe_audio, model, audio)
+        if not answer or confidence < BotConfig.AUDIO_MIN_CONFIDENCE:
+            logger.info("Ses sorusu güveni düşük (%.2f), 2Captcha kullanılacak.", confidence)
+            return None
 
-        # Sonucu kontrol et
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.CLASS_NAME, "sonucMesaji"))
+        async with driver_lock:
+            await asyncio.to_thread(_answer_audio_challenge, driver, handle, answer)
+        token = await _poll_in_frame(
+            context, driver, handle, None, _TOKEN_JS, BotConfig.AUDIO_TOKEN_TIMEOUT
         )
-        result_text = driver.find_element(By.CLASS_NAME, "sonucMesaji").text
-        if "erişimi engellenmiştir" in result_text.lower():
-            status = "Erişim engelli"
+        if not token:
+            logger.info("Ses sorusu cevabı kabul edilmedi, 2Captcha kullanılacak.")
+        return token
+    except Exception as e:
+        logger.warning("Ses sorusu çözülemedi, 2Captcha kullanılacak: %s", e)
+        return None
+
+def _is_rate_limited(error: Exception) -> bool:
+    """2Captcha hatasının hız sınırı/kota kaynaklı olup olmadığını söyle."""
+    message = str(error).lower()
+    return any(marker in message for marker in ("429", "rate", "quota", "no_slot"))
+
+async def _submit_captcha(site_key: str, url: str) -> str:
+    """reCAPTCHA'yı 2Captcha'ya gönder; hız sınırında üstel geri çekilmeyle yeniden dene."""
+    global _captcha_cooldown_until
+    for attempt in range(BotConfig.MAX_RETRIES):
+        wait = _captcha_cooldown_until - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        try:
+            return await asyncio.to_thread(
+                captcha_solver.send, method="userrecaptcha", googlekey=site_key, pageurl=url
+            )
+        except SolverExceptions as e:
+            if not _is_rate_limited(e) or attempt == BotConfig.MAX_RETRIES - 1:
+                raise
+            delay = min(BotConfig.CAPTCHA_BACKOFF_MAX, BotConfig.CAPTCHA_BACKOFF_BASE * 2 ** attempt)
+            _captcha_cooldown_until = max(_captcha_cooldown_until, time.monotonic() + delay)
+            logger.warning("2Captcha hız sınırı (%s); %.0f saniye bekleniyor.", e, delay)
+
+async def solve_recaptcha(site_key: str, url: str) -> str:
+    """reCAPTCHA'yı 2Captcha'ya gönder ve olay döngüsünü bloklamadan sonucu bekle."""
+    captcha_id = await _submit_captcha(site_key, url)
+    for _ in range(BotConfig.CAPTCHA_TIMEOUT // BotConfig.CAPTCHA_POLL_INTERVAL):
+        await asyncio.sleep(BotConfig.CAPTCHA_POLL_INTERVAL)
+        try:
+            return await asyncio.to_thread(captcha_solver.get_result, captcha_id)
+        except NetworkException:
+            # CAPCHA_NOT_READY: henüz çözülmedi
+            continue
+    raise TimeoutError(f"Captcha {BotConfig.CAPTCHA_TIMEOUT} saniyede çözülemedi.")
+
+async def _await_captcha(
+    context: ContextTypes.DEFAULT_TYPE,
+    captcha_task: asyncio.Task | None,
+    captcha_key: str | None,
+    site_key: str,
+) -> str:
+    """Önceden başlatılan 2Captcha görevini bekle; görev yoksa ya da anahtar değiştiyse yeniden gönder."""
+    if captcha_task is None or site_key != captcha_key:
+        if captcha_task:
+            captcha_task.cancel()
+        # Sonraki sorgular çözümü sayfa yüklenirken başlatabilsin
+        context.bot_data["recaptcha_site_key"] = site_key
+        captcha_task = asyncio.create_task(solve_recaptcha(site_key, BTK_QUERY_URL))
+    return await captcha_task
+
+async def check_site_status_http(context: ContextTypes.DEFAULT_TYPE, site: str) -> str | None:
+    """Siteyi BTK'da tarayıcısız sorgula; sayfa beklenen yapıda değilse None döndür."""
+    # Her sorgunun kendi çerezleri olsun diye istemci sorgu başına; bağlantı havuzu
+    # (transport) ortak. Kapatılmaz: aclose() ortak havuzu da kapatırdı.
+    client = httpx.AsyncClient(
+        transport=context.bot_data["http_transport"],
+        headers={"User-Agent": USER_AGENT},
+        follow_redirects=True,
+        timeout=BotConfig.HTTP_TIMEOUT,
+    )
+    captcha_key = context.bot_data["recaptcha_site_key"]
+    captcha_task = None
+    if captcha_key:
+        captcha_task = asyncio.create_task(solve_recaptcha(captcha_key, BTK_QUERY_URL))
+    try:
+        response = await client.get(BTK_QUERY_URL)
+        response.raise_for_status()
+        page = _BtkPageParser(response.text)
+        form = page.query_form
+        if form is None or not page.site_key:
+            return None
+
+        token = await _await_captcha(context, captcha_task, captcha_key, page.site_key)
+        fields = dict(form["fields"])
+        fields[form["domain_field"]] = site
+        fields["g-recaptcha-response"] = token
+        action = urljoin(str(response.url), form["action"])
+        if form["method"] == "get":
+            response = await client.get(action, params=fields)
+        else:
+            response = await client.post(action, data=fields)
+        response.raise_for_status()
+
+        result_text = _BtkPageParser(response.text).result_text
+        if result_text is None:
+            return None
+        return classify_result(result_text)
+    finally:
+        if captcha_task and not captcha_task.done():
+            captcha_task.cancel()
+
+async def check_site_status(context: ContextTypes.DEFAULT_TYPE, site: str) -> tuple[str, bytes | None]:
+    """Siteyi BTK'da sorgula; yakın zamanda serbest çıktıysa önbellekten döndür."""
+    if site in _status_cache:
+        logger.debug("Önbellekten: %s - %s", site, _status_cache[site])
+        return f"{_status_cache[site]} (önbellek)", None
+
+    status, screenshot = await _query_btk(context, site)
+    if status == "Erişim serbest":
+        _status_cache[site] = status
+    return status, screenshot
+
+async def _query_btk(context: ContextTypes.DEFAULT_TYPE, site: str) -> tuple[str, bytes | None]:
+    """Siteyi BTK'da sorgula; ekran görüntüsü yalnızca tarayıcı yolunda alınır."""
+    bot_data = context.bot_data
+    # BTK'ya giden sorguları yay; IP engeline karşı patlamalı istek gönderme
+    await bot_data["btk_bucket"].acquire()
+    logger.info("Site sorgulanıyor: %s", site)
+    async with bot_data["query_semaphore"]:
+        if not bot_data["use_browser"]:
+            try:
+                status = await check_site_status_http(context, site)
+            except httpx.HTTPStatusError as e:
+                code = e.response.status_code
+                if code != 403:
+                    # 429/5xx geçicidir; hemen tarayıcıyla yeniden denemek BTK'yı daha çok yorar
+                    logger.error("BTK HTTP hatası (%s): %s", code, site)
+                    return f"Hata: BTK HTTP {code}", None
+                # Bot doğrulama sayfası: yalnızca bu sorguyu tarayıcıyla dene
+                logger.warning("BTK HTTP isteğini reddetti (403); %s tarayıcıyla sorgulanacak.", site)
+            except Exception as e:
+                logger.error("Sorgulama hatası: %s", e, exc_info=True)
+                return f"Hata: {str(e)}", None
+            else:
+                if status is not None:
+                    return status, None
+                # Sayfa yapısı değişti; süreç boyunca tarayıcıyla sorgula
+                logger.warning("BTK sayfası tarayıcısız çözümlenemedi; tarayıcıya geçiliyor.")
+                bot_data["use_browser"] = True
+            # Tarayıcıyla yeniden sorgu da BTK'ya gider; hız sınırına tabi
+            await bot_data["btk_bucket"].acquire()
+        return await check_site_status_browser(context, site)
+
+async def check_site_status_browser(context: ContextTypes.DEFAULT_TYPE, site: str) -> tuple[str, bytes | None]:
+    """Siteyi BTK'da kendi sekmesinde sorgula.
+
+    Sekme işlemleri ortak sürücü kilidi altında sırayla yapılır; captcha
+    beklemesi kilidin dışında kaldığı için diğer sitelerle paralel ilerler.
+    Önce ses sorusu yerel modelle denenir; model yoksa ve site anahtarı
+    biliniyorsa 2Captcha çözümü sayfa yüklenirken başlar.
+    """
+    screenshot = None
+    driver_lock = context.bot_data["driver_lock"]
+    driver = None
+    handle = None
+    captcha_key = context.bot_data["recaptcha_site_key"]
+    captcha_task = None
+    # Yerel çözücü varsa 2Captcha'ya yalnızca o başarısız olursa başvur
+    if captcha_key and await get_whisper_model(context) is None:
+        captcha_task = asyncio.create_task(solve_recaptcha(captcha_key, BTK_QUERY_URL))
+    try:
+        async with driver_lock:
+            driver = await asyncio.to_thread(get_or_create_driver, context)
+            context.bot_data["driver_uses"] += 1
+            handle = await asyncio.to_thread(_open_tab, driver)
+            site_key = await asyncio.to_thread(_open_query_page, driver, site)
+
+        # reCAPTCHA'yı çöz; 2Captcha görevi yoksa ya da anahtar değiştiyse şimdi gönder
+        token = await solve_recaptcha_audio(context, driver, handle)
+        if token is None:
+            token = await _await_captcha(context, captcha_task, captcha_key, site_key)
 
-        # Ekran görüntüsü al
-        driver.save_screenshot(screenshot_path)
+        async with driver_lock:
+            status = await asyncio.to_thread(_submit_query, driver, handle, token)
+            # Serbest sonuç (olağan durum) için görüntü alınmaz; kanıt yalnızca engel/hatada gerekir
+            screenshot = await asyncio.to_thread(
+                _close_tab, driver, handle, status != "Erişim serbest"
+            )
 
     except Exception as e:
         logger.error("Sorgulama hatası: %s", e, exc_info=True)
         status = f"Hata: {str(e)}"
         if driver:
-            driver.save_screenshot(screenshot_path)
+            async with driver_lock:
+                closed = False
+                if handle:
+                    try:
+                        screenshot = await asyncio.to_thread(_close_tab, driver, handle)
+                        closed = True
+                    except Exception as close_error:
+                        logger.warning("Sekme kapatılamadı: %s", close_error)
+                # Sekme açılamadı ya da kapatılamadıysa oturum bozuktur;
+                # bırak ki bir sonraki sorgu yenisini açsın
+                if not closed and context.bot_data.get("driver") is driver:
+                    await asyncio.to_thread(discard_driver, context)
 
     finally:
-        if driver:
-            driver.quit()
+        if captcha_task and not captcha_task.done():
+            captcha_task.cancel()
+
+    return status, screenshot
 
-    return status, screenshot_path
+def _result_line(site: str, status: str) -> str:
+    """Sonuç satırını oluştur; uzun hata metinleri (Selenium yığın izi) kısaltılır."""
+    if len(status) > BotConfig.MAX_STATUS_LENGTH:
+        status = status[:BotConfig.MAX_STATUS_LENGTH - 1] + "…"
+    return f"Sonuç: {site} - {status}"
+
+async def send_results(bot: Bot, results: list[tuple[str, str, bytes | None]], header: str) -> None:
+    """Sorgu sonuçlarını en az çağrıyla gönder.
+
+    Ekran görüntüsü olmayan sonuçlar başlıkla birlikte tek mesajda, görüntüler
+    açıklamalarıyla medya grubunda gider; hepsinin görüntüsü varsa başlık ilk
+    görüntünün açıklamasına eklenir.
+    """
+    lines = [_result_line(site, status) for site, status, screenshot in results if not screenshot]
+    if lines:
+        await bot.send_message(GROUP_ID, "\n".join([header, *lines]))
+
+    photos = [
+        InputMediaPhoto(io.BytesIO(screenshot), caption=_result_line(site, status))
+        for site, status, screenshot in results
+        if screenshot
+    ]
+    if photos and not lines:
+        photos[0] = InputMediaPhoto(photos[0].media, caption=f"{header}\n{photos[0].caption}")
+    # Telegram bir medya grubunda en fazla 10, en az 2 öğe kabul eder
+    for i in range(0, len(photos), 10):
+        batch = photos[i:i + 10]
+        if len(batch) == 1:
+            await bot.send_photo(GROUP_ID, photo=batch[0].media, caption=batch[0].caption)
+        else:
+            await bot.send_media_group(GROUP_ID, media=batch)
 
 async def test_job(context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Planlanmış sorgulama görevi."""
+    """Planlanmış sorgulama görevi: tüm siteleri aynı anda sorgula."""
     if not GROUP_ID:
         logger.error("GROUP_ID tanımlı değil.")
         return
 
-    sites = load_sites()
+    store = context.bot_data["sites"]
+    sites = list(store)
     if not sites:
         logger.warning("Sorgulanacak site yok.")
         await context.bot.send_message(GROUP_ID, "Sorgulanacak site yok.")
         return
 
-    current_site = sites[0]
-    logger.info("Sorgulama yapılıyor: %s", current_site)
-    await context.bot.send_message(
-        GROUP_ID,
-        f"Sorgulama yapılıyor: {current_site}\nZaman: {datetime.now(ISTANBUL_TZ).strftime('%Y-%m-%d %H:%M:%S')}"
-    )
+    # Uzun ömürlü oturumun belleği büyür; sekme açık değilken, tarama başlamadan yenile
+    if context.bot_data.get("driver_uses", 0) >= BotConfig.DRIVER_MAX_USES:
+        logger.info("Chromedriver %d sorgudan sonra yenileniyor.", context.bot_data["driver_uses"])
+        async with context.bot_data["driver_lock"]:
+            await asyncio.to_thread(discard_driver, context)
+
+    logger.info("Sorgulama yapılıyor: %s", sites)
+    started_at = datetime.now(ISTANBUL_TZ).strftime(TIME_FORMAT)
 
-    status, screenshot_path = await check_site_status(context, current_site)
-    await context.bot.send_photo(
-        GROUP_ID,
-        photo=open(screenshot_path, "rb"),
-        caption=(
-            f"Sonuç: {current_site} - {status}\n"
-            f"Zaman: {datetime.now(ISTANBUL_TZ).strftime('%Y-%m-%d %H:%M:%S')}"
+    # /next sürmekte olan taramayı gösterebilsin; tek olay döngüsünde yazıldığından kilit gerekmez
+    context.bot_data["query_started_at"] = started_at
+    try:
+        results = await asyncio.gather(
+            *(check_site_status(context, site) for site in sites),
+            return_exceptions=True,
         )
-    )
+    finally:
+        context.bot_data.pop("query_started_at", None)
+    finished_at = datetime.now(ISTANBUL_TZ).strftime(TIME_FORMAT)
+
+    report = []
+    blocked = []
+    for site, result in zip(sites, results):
+        if isinstance(result, BaseException):
+            logger.error("Sorgulama hatası (%s): %s", site, result)
+            result = (f"Hata: {str(result)}", None)
+        status, screenshot = result
+        report.append((site, status, screenshot))
+        if "Erişim engelli" in status:
+            logger.info("Erişim engelli: %s", site)
+            blocked.append(site)
 
-    if "Erişim engelli" in status:
-        logger.info("Erişim engelli: %s", current_site)
-        sites.pop(0)
-        if sites:
-            next_site = sites[0]
-            update_sites_file(sites)
-            await context.bot.send_message(
-                GROUP_ID,
-                (
-                    f"**EERİŞİM ENGELİ PROTOKOLÜ: {current_site} değiştirildi. "
-                    f"Sorgulanacak domain güncellendi.**\n"
-                    f"Zaman: {datetime.now(ISTANBUL_TZ).strftime('%Y-%m-%d %H:%M:%S')}"
+    # Liste Telegram'a göndermeden önce güncellenir; gönderim hatası çıkarmayı atlatmasın
+    removed = []
+    all_blocked = False
+    if blocked:
+        async with store.lock:
+            # Tüm siteler engellendiyse listeyi boşaltma; sondaki site yeni site eklenene
+            # kadar sorgulanmaya devam etsin, diğerleri her taramada boşuna sorgulanmasın
+            all_blocked = all(site in blocked for site in store)
+            removable = blocked[:-1] if all_blocked else blocked
+            removed = [site for site in removable if store.remove(site)]
+            for site in removed:
+                logger.info("Site listeden çıkarıldı: %s", site)
+            if removed:
+                await asyncio.to_thread(
+                    append_sites_journal, [f"-{site}" for site in removed], list(store)
                 )
+
+    await send_results(context.bot, report, f"Sorgulama: {started_at} - {finished_at}")
+
+    if removed:
+        await context.bot.send_message(
+            GROUP_ID,
+            (
+                f"**EERİŞİM ENGELİ PROTOKOLÜ: {', '.join(removed)} değiştirildi. "
+                f"Sorgulanacak domain güncellendi.**\n"
+                f"Zaman: {finished_at}"
             )
-        else:
-            await context.bot.send_message(
-                GROUP_ID,
-                "Tüm siteler engellendi. Yeni site ekleyin."
-            )
+        )
+    if all_blocked:
+        await context.bot.send_message(
+            GROUP_ID,
+            "Tüm siteler engellendi. Yeni site ekleyin."
+        )
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Başlangıç komutu."""
-    await update.message.reply_text("Bot çalışıyor! Komutlar: /add, /remove, /next")
+    await update.message.reply_text("Bot çalışıyor! Komutlar: /add, /remove, /next, /flush")
 
 async def add_site(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Yeni site ekle."""
@@ -218,14 +1082,19 @@ async def add_site(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         await update.message.reply_text("Lütfen bir site belirtin: /add example.com")
         return
 
-    site = context.args[0].strip()
-    sites = load_sites()
-    if site in sites:
-        await update.message.reply_text(f"{site} zaten listede.")
+    site = context.args[0].strip().lower()
+    if not is_valid_domain(site):
+        await update.message.reply_text(f"{site} geçerli bir alan adı değil.")
         return
 
-    sites.append(site)
-    update_sites_file(sites)
+    store = context.bot_data["sites"]
+    async with store.lock:
+        added = store.add(site)
+        if added:
+            await asyncio.to_thread(append_sites_journal, [f"+{site}"], list(store))
+    if not added:
+        await update.message.reply_text(f"{site} zaten listede.")
+        return
     logger.info("Site eklendi: %s", site)
     await update.message.reply_text(f"{site} listeye eklendi.")
 
@@ -235,17 +1104,25 @@ async def remove_site(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
         await update.message.reply_text("Lütfen bir site belirtin: /remove example.com")
         return
 
-    site = context.args[0].strip()
-    sites = load_sites()
-    if site not in sites:
+    site = context.args[0].strip().lower()
+    store = context.bot_data["sites"]
+    async with store.lock:
+        removed = store.remove(site)
+        if removed:
+            await asyncio.to_thread(append_sites_journal, [f"-{site}"], list(store))
+    if not removed:
         await update.message.reply_text(f"{site} listede değil.")
         return
-
-    sites.remove(site)
-    update_sites_file(sites)
     logger.info("Site silindi: %s", site)
     await update.message.reply_text(f"{site} listeden çıkarıldı.")
 
+async def flush_cache(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Sonuç önbelleğini temizle; sonraki sorguda tüm siteler BTK'ya sorulur."""
+    count = len(_status_cache)
+    _status_cache.clear()
+    logger.info("Sonuç önbelleği temizlendi (%d kayıt).", count)
+    await update.message.reply_text(f"Önbellek temizlendi ({count} kayıt).")
+
 async def next_query(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Bir sonraki sorguya kalan süreyi göster."""
     scheduler = context.bot_data.get("scheduler")
@@ -253,6 +1130,11 @@ async def next_query(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
         await update.message.reply_text("Planlanmış görev bulunamadı.")
         return
 
+    started_at = context.bot_data.get("query_started_at")
+    if started_at:
+        await update.message.reply_text(f"Sorgulama sürüyor (başlangıç: {started_at}).")
+        return
+
     next_run = scheduler.get_job("query_job").next_run_time
     time_diff = (next_run - datetime.now(ISTANBUL_TZ)).total_seconds()
     minutes, seconds = divmod(int(time_diff), 60)
@@ -260,6 +1142,34 @@ async def next_query(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
         f"Bir sonraki sorguya kalan süre: {minutes:02d}:{seconds:02d}"
     )
 
+async def prewarm_captcha_client() -> None:
+    """2Captcha bağlantısını açılışta kur; ilk sorguda TLS el sıkışması beklenmesin."""
+    if not TWOCAPTCHA_API_KEY:
+        return
+    try:
+        balance = await asyncio.to_thread(captcha_solver.balance)
+        logger.info("2Captcha bakiyesi: %s", balance)
+    except (ApiException, NetworkException) as e:
+        logger.warning("2Captcha bağlantısı kurulamadı: %s", e)
+
+async def on_startup(app: Application) -> None:
+    """Bot açılışında webhook'u kaldır ve dış bağlantıları ısıt."""
+    await app.bot.set_webhook(None)
+    await prewarm_captcha_client()
+
+def log_missed_job(event: JobExecutionEvent | JobSubmissionEvent) -> None:
+    """Kaçırılan ve önceki sorgu sürdüğü için atlanan çalıştırmaları logla."""
+    if event.code == EVENT_JOB_MAX_INSTANCES:
+        logger.warning(
+            "Görev atlandı, önceki çalıştırma sürüyor: %s (planlanan zaman: %s)",
+            event.job_id,
+            ", ".join(str(run_time) for run_time in event.scheduled_run_times),
+        )
+        return
+    logger.warning(
+        "Görev kaçırıldı: %s (planlanan zaman: %s)", event.job_id, event.scheduled_run_time
+    )
+
 def schedule_jobs(app: Application) -> None:
     """Planlanmış görevleri ayarla."""
     scheduler = AsyncIOScheduler(timezone=ISTANBUL_TZ)
@@ -274,24 +1184,52 @@ def schedule_jobs(app: Application) -> None:
         ),
         id="query_job",
         replace_existing=True,
+        coalesce=True,  # biriken kaçırılmış çalıştırmaları teke indir
+        max_instances=1,  # önceki sorgu bitmeden yenisini başlatma
+        misfire_grace_time=60,
+        args=[app],
+    )
+    scheduler.add_job(
+        recycle_driver,
+        trigger=CronTrigger(
+            day_of_week="sun",
+            hour=3,
+            minute=0,  # Haftada bir, sorgu saatleri dışında
+            timezone=ISTANBUL_TZ
+        ),
+        id="driver_recycle_job",
+        replace_existing=True,
         args=[app],
     )
+    scheduler.add_listener(log_missed_job, EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES)
     scheduler.start()
     app.bot_data["scheduler"] = scheduler
+    app.bot_data["driver_lock"] = asyncio.Lock()
+    app.bot_data["query_semaphore"] = asyncio.Semaphore(BotConfig.MAX_PARALLEL_QUERIES)
+    app.bot_data["btk_bucket"] = TokenBucket(rate=BotConfig.BTK_RATE, burst=BotConfig.BTK_BURST)
+    app.bot_data["whisper_lock"] = asyncio.Lock()
+    app.bot_data["use_browser"] = BotConfig.USE_BROWSER
+    app.bot_data["recaptcha_site_key"] = BotConfig.RECAPTCHA_SITE_KEY
+    app.bot_data["http_transport"] = httpx.AsyncHTTPTransport(
+        limits=httpx.Limits(max_connections=10, keepalive_expiry=60)
+    )
+    if BotConfig.USE_BROWSER:
+        get_or_create_driver(app)
     logger.info("Planlanmış görevler başlatıldı.")
 
 async def main() -> None:
     """Ana fonksiyon, botu çalıştırır."""
     logger.info("Bot başlatılıyor...")
-    app = Application.builder().token(BOT_TOKEN).post_init(lambda app: app.bot.set_webhook(None)).analytics(False).build()
+    app = Application.builder().token(BOT_TOKEN).concurrent_updates(True).post_init(on_startup).post_stop(release_resources).analytics(False).build()
+    app.bot_data["sites"] = SiteStore(load_sites())
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("add", add_site))
     app.add_handler(CommandHandler("remove", remove_site))
     app.add_handler(CommandHandler("next", next_query))
+    app.add_handler(CommandHandler("flush", flush_cache))
 
     schedule_jobs(app)
     await app.run_polling()
 
 if __name__ == "__main__":
-    import asyncio
     asyncio.run(main())
\ No newline at end of file